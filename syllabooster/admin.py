@@ -14,12 +14,63 @@ from .models import (
 
 # Register your models here.
 
-admin.site.register(Tag)
-admin.site.register(PointType)
-admin.site.register(DeliveryState)
-admin.site.register(Point)
-admin.site.register(Syllabus)
-admin.site.register(SyllabusPoint)
-admin.site.register(Course)
-admin.site.register(CoursePoint)
-admin.site.register(Unit)
+
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_per_page = 50
+    show_full_result_count = False
+    search_fields = ("name",)
+
+
+@admin.register(PointType)
+class PointTypeAdmin(admin.ModelAdmin):
+    list_display = ("name", "icon")
+
+
+@admin.register(DeliveryState)
+class DeliveryStateAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "position", "name")
+    list_select_related = ("point_type",)
+
+
+@admin.register(Point)
+class PointAdmin(admin.ModelAdmin):
+    list_display = ("headline", "point_type")
+    list_select_related = ("point_type",)
+    list_per_page = 50
+    show_full_result_count = False
+    search_fields = ("headline",)
+    autocomplete_fields = ("tags",)
+
+
+@admin.register(Syllabus)
+class SyllabusAdmin(admin.ModelAdmin):
+    search_fields = ("name",)
+
+
+@admin.register(SyllabusPoint)
+class SyllabusPointAdmin(admin.ModelAdmin):
+    list_select_related = ("syllabus", "point")
+    list_per_page = 50
+    show_full_result_count = False
+    autocomplete_fields = ("point",)
+
+
+@admin.register(Course)
+class CourseAdmin(admin.ModelAdmin):
+    list_display = ("name", "user")
+    list_select_related = ("user",)
+
+
+@admin.register(CoursePoint)
+class CoursePointAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "unit", "state")
+    list_select_related = ("course", "point", "unit__course__user", "state__point_type")
+    list_per_page = 50
+    show_full_result_count = False
+    autocomplete_fields = ("point",)
+
+
+@admin.register(Unit)
+class UnitAdmin(admin.ModelAdmin):
+    list_select_related = ("course__user",)
@@ -6,6 +6,7 @@
 # - course: the name of the course to import;
 # - inputfilename: the name of the input file;
 # - -t,--type: the format of the input file (currently, only org and MD are supported).
+# - -p,--profile: print the number of SQL queries issued and the time spent in them;
 # - -f,--force: don't ask for confirmation before overwriting an existing course
 #
 # If the course exists, it will be overwritten, but the user will be asked for confirmation
@@ -44,11 +45,11 @@
 from pathlib import Path
 
 import mistune
-import orgparse
 
 from django.core.management.base import BaseCommand, CommandError
-from django.db.models import Max
+from django.db import transaction
 from syllabooster.models import *
+from syllabooster.utils import importstr
 
 
 class Command(BaseCommand):
@@ -59,6 +60,12 @@ class Command(BaseCommand):
         parser.add_argument("inputfilename", help="Input file name")
         parser.add_argument("-u", "--user", default="manuel")
         parser.add_argument("-t", "--type", default="org", help="Input file type")
+        parser.add_argument(
+            "-p",
+            "--profile",
+            action="store_true",
+            help="Print the number of SQL queries issued and their cumulative time",
+        )
         parser.add_argument(
             "-f",
             "--force",
@@ -67,58 +74,11 @@ class Command(BaseCommand):
         )
 
     def parse_org(self, input_string):
-        root = orgparse.loads(input_string)
-        current_unit = 0
-        next_point = 1
-        unit_tags = {}
-        for node in root[1:]:
-            if node.level == 1:
-                current_unit = current_unit + 1
-                node.unit = current_unit
-                unit = Unit.objects.create(
-                    course=self.course, position=current_unit, title=node.heading
-                )
-                unit_tags[current_unit] = []
-                for tag in node.tags:
-                    unit_tags[current_unit].append(tag)
-            elif node.level == 2:
-                point, created = Point.objects.get_or_create(headline=node.heading)
-                point.contents = node.body
-                point.save()
-                for tag in node.tags:
-                    db_tag, created = Tag.objects.get_or_create(name=tag)
-                    point.tags.add(db_tag)
-                point_type = node.get_property("TYPE") or "Theory"
-                point.point_type = PointType.objects.get(name=point_type)
-                point.save()
-
-                state = None
-                todo = node.todo.lower()
-                if todo:
-                    try:
-                        state = DeliveryState.objects.filter(
-                            point_type_id=point.point_type.id
-                        ).get(name=todo)
-                    except DeliveryState.DoesNotExist:
-                        state = None
-                unit = None
-                if not (node.parent is root):
-                    unit_position = node.parent.unit
-                    unit = Unit.objects.get(course=self.course, position=unit_position)
-                    for tag in unit_tags[unit_position]:
-                        db_tag, created = Tag.objects.get_or_create(name=tag)
-                        point.tags.add(db_tag)
-                    point.save()
-
-                coursepoint = CoursePoint(
-                    course=self.course,
-                    point=point,
-                    position=next_point,
-                    state=state,
-                    unit=unit,
-                )
-                coursepoint.save()
-                next_point = next_point + 1
+        units, points = importstr.read_org(input_string, number_units=True)
+        try:
+            importstr.write_org(self.course, units, points)
+        except PointType.DoesNotExist as error:
+            raise CommandError(error)
 
     def parse_md(self, input_string):
         markdown_parser = mistune.create_markdown(renderer=None)
@@ -136,9 +96,12 @@ class Command(BaseCommand):
         except User.DoesNotExist:
             raise CommandError('User "%s" does not exist' % user)
         course_name = options["course"]
-        self.course, created = Course.objects.get_or_create(
-            name=course_name, user=self.user
-        )
+        inputfilename = options["inputfilename"]
+        inputfilepath = Path(inputfilename)
+        if not inputfilepath.is_file():
+            raise CommandError('File "%s" not found' % inputfilename)
+        input_string = inputfilepath.read_text(encoding="utf-8")
+        input_format = options["type"]
         if Course.objects.filter(name=course_name, user=self.user).exists():
             if not options["force"]:
                 self.stdout.write(
@@ -150,18 +113,15 @@ class Command(BaseCommand):
                 if confirm.lower() not in ["y", "yes"]:
                     self.stdout.write(self.style.ERROR("Operation cancelled."))
                     return
-            Course.objects.filter(name=course_name, user=self.user).delete()
-
-        self.course = Course.objects.create(name=course_name, user=self.user)
 
-        inputfilename = options["inputfilename"]
-        inputfilepath = Path(inputfilename)
-        if not inputfilepath.is_file():
-            raise CommandError('File "%s" not found' % inputfilename)
-        with open(inputfilepath, "r") as mdfile:
-            input_string = mdfile.read()
-        input_format = options["type"]
-        if input_format == "md":
-            self.parse_md(input_string)
-        elif input_format == "org":
-            self.parse_org(input_string)
+        # The old course is only replaced if the new one is imported successfully.
+        with (
+            importstr.report_queries(self.stdout, options["profile"]),
+            transaction.atomic(),
+        ):
+            Course.objects.filter(name=course_name, user=self.user).delete()
+            self.course = Course.objects.create(name=course_name, user=self.user)
+            if input_format == "md":
+                self.parse_md(input_string)
+            elif input_format == "org":
+                self.parse_org(input_string)
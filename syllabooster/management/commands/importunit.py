@@ -9,6 +9,7 @@
 # - -t,--type: the format of the input file (currently, only org and MD are supported);
 # - -n,--unitnumber: (optional) the number of the unit to import;
 # - -i,--insert: (options) units will be inserted in the given positions;
+# - -p,--profile: print the number of SQL queries issued and the time spent in them;
 # - -f,--force: don't ask for confirmation.
 #
 # If the course doesn't exist, it will be created. Otherwise, it will be modified.
@@ -62,28 +63,10 @@
 from pathlib import Path
 
 import mistune
-import orgparse
 
 from django.core.management.base import BaseCommand, CommandError
-from django.db.models import Max, F
 from syllabooster.models import *
-
-
-def renumber_points(course):
-    units = Unit.objects.filter(course=course).order_by("position")
-    point_number = 1
-    for unit in units:
-        points = CoursePoint.objects.filter(unit=unit).order_by("position")
-        for point in points:
-            point.position = point_number
-            point.save()
-            point_number = point_number + 1
-
-
-def should_be_imported(unit, unitnumbers):
-    if len(unitnumbers) > 0:
-        return unit in unitnumbers
-    return True
+from syllabooster.utils import importstr
 
 
 class Command(BaseCommand):
@@ -100,6 +83,12 @@ class Command(BaseCommand):
         parser.add_argument(
             "-i", "--insert", action="store_true", help="insert instead of replace"
         )
+        parser.add_argument(
+            "-p",
+            "--profile",
+            action="store_true",
+            help="Print the number of SQL queries issued and their cumulative time",
+        )
         parser.add_argument(
             "-f",
             "--force",
@@ -108,97 +97,19 @@ class Command(BaseCommand):
         )
 
     def parse_org(self, input_string, unitnumbers, insert, force):
-        root = orgparse.loads(input_string)
-        current_unit = 0
-        next_point = 1
-        unit_tags = {}
-        self.stdout.write(f"Unit numbers to be imported: {unitnumbers or 'all'}")
-        for node in root[1:]:
-            if node.level == 1:
-                current_unit = int(node.get_property("POSITION"))
-                node.unit = current_unit
-                self.stdout.write(
-                    f'Found unit "{node.heading}" with position {current_unit}'
-                )
-                if should_be_imported(current_unit, unitnumbers):
-                    self.stdout.write(f"Position {current_unit} should be imported.")
-                    if Unit.objects.filter(
-                        course=self.course, position=current_unit
-                    ).exists():
-                        if not insert:
-                            if not force:
-                                self.stdout.write(
-                                    self.style.WARNING(
-                                        f"There is already a unit with number {current_unit} in course {self.course.name} for user {self.user.username}: it will be replaced."
-                                    )
-                                )
-                                confirm = input(
-                                    "Are you sure you want to proceed? [y/N]: "
-                                )
-                                if confirm.lower() not in ["y", "yes"]:
-                                    self.stdout.write(self.style.ERROR("Unit skipped."))
-                                    continue
-                            Unit.objects.filter(
-                                course=self.course, position=current_unit
-                            ).delete()
-                        else:
-                            Unit.objects.filter(
-                                course=self.course, position__gte=current_unit
-                            ).update(position=F("position") + 10000)
-                            Unit.objects.filter(
-                                self.course, position__gte=current_unit + 10000
-                            ).update(position=F("position") - 9999)
-
-                    unit = Unit.objects.create(
-                        course=self.course,
-                        position=current_unit,
-                        title=node.heading,
-                    )
-                    unit_tags[current_unit] = []
-                    for tag in node.tags:
-                        unit_tags[current_unit].append(tag)
-            elif should_be_imported(current_unit, unitnumbers) and node.level == 2:
-                point_type = node.get_property("TYPE") or "Theory"
-                self.stdout.write(
-                    f'Importing point "{node.heading}" of type {point_type}'
-                )
-                point, created = Point.objects.get_or_create(headline=node.heading)
-                point.contents = node.body
-                point.save()
-                for tag in node.tags:
-                    db_tag, created = Tag.objects.get_or_create(name=tag)
-                    point.tags.add(db_tag)
-                point.point_type = PointType.objects.get(name=point_type.lower())
-                point.save()
-
-                state = None
-                todo = node.todo.lower()
-                if todo:
-                    try:
-                        state = DeliveryState.objects.filter(
-                            point_type_id=point.point_type.id
-                        ).get(name=todo)
-                    except DeliveryState.DoesNotExist:
-                        state = None
-                unit = None
-                if not (node.parent is root):
-                    unit_position = node.parent.unit
-                    unit = Unit.objects.get(course=self.course, position=unit_position)
-                    for tag in unit_tags[unit_position]:
-                        db_tag, created = Tag.objects.get_or_create(name=tag)
-                        point.tags.add(db_tag)
-                    point.save()
-
-                coursepoint = CoursePoint(
-                    course=self.course,
-                    point=point,
-                    position=next_point,
-                    state=state,
-                    unit=unit,
-                )
-                coursepoint.save()
-                next_point = next_point + 1
-        renumber_points(self.course)
+        try:
+            importstr.parse_org(
+                self.course,
+                input_string,
+                self.user,
+                unitnumbers,
+                insert,
+                force,
+                self.stdout,
+                self.style,
+            )
+        except PointType.DoesNotExist as error:
+            raise CommandError(error)
 
     def parse_md(self, input_string, unitnumbers, insert, force):
         markdown_parser = mistune.create_markdown(renderer=None)
@@ -221,17 +132,17 @@ class Command(BaseCommand):
         inputfilepath = Path(inputfilename)
         if not inputfilepath.is_file():
             raise CommandError('File "%s" not found' % inputfilename)
-        with open(inputfilepath, "r") as mdfile:
-            input_string = mdfile.read()
+        input_string = inputfilepath.read_text(encoding="utf-8")
         self.unitnumbers = []
         if options["unitnumber"]:
             self.unitnumbers = [options["unitnumber"]]
         input_format = options["type"]
-        if input_format == "md":
-            self.parse_md(
-                input_string, self.unitnumbers, options["insert"], options["force"]
-            )
-        elif input_format == "org":
-            self.parse_org(
-                input_string, self.unitnumbers, options["insert"], options["force"]
-            )
+        with importstr.report_queries(self.stdout, options["profile"]):
+            if input_format == "md":
+                self.parse_md(
+                    input_string, self.unitnumbers, options["insert"], options["force"]
+                )
+            elif input_format == "org":
+                self.parse_org(
+                    input_string, self.unitnumbers, options["insert"], options["force"]
+                )
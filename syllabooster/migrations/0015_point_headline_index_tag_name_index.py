@@ -0,0 +1,19 @@
+# Generated by Django 6.1.2 on 2026-10-15 22:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("syllabooster", "0014_alter_point_contents"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="point",
+            index=models.Index(
+                fields=["headline"], name="syllabooste_headlin_a062ac_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 6.1.2 on 2026-10-15 22:12
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_tags(apps, schema_editor):
+    """Keep the oldest tag of each name, moving the points of its duplicates to it."""
+    Tag = apps.get_model("syllabooster", "Tag")
+    Point = apps.get_model("syllabooster", "Point")
+    PointTag = Point.tags.through
+    duplicated_names = (
+        Tag.objects.values("name")
+        .annotate(count=Count("id"), canonical_id=Min("id"))
+        .filter(count__gt=1)
+    )
+    for row in duplicated_names:
+        duplicates = Tag.objects.filter(name=row["name"]).exclude(
+            id=row["canonical_id"]
+        )
+        point_ids = set(
+            PointTag.objects.filter(tag__in=duplicates).values_list(
+                "point_id", flat=True
+            )
+        )
+        PointTag.objects.bulk_create(
+            [
+                PointTag(point_id=point_id, tag_id=row["canonical_id"])
+                for point_id in point_ids
+            ],
+            ignore_conflicts=True,
+        )
+        duplicates.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("syllabooster", "0015_point_headline_index_tag_name_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_tags, migrations.RunPython.noop),
+    ]
@@ -9,7 +9,7 @@ md = MarkdownIt("commonmark", {"html": False})
 
 
 class Tag(models.Model):
-    name = models.CharField(max_length=50)
+    name = models.CharField(max_length=50, unique=True)
 
     def __str__(self):
         return str(self.name)
@@ -51,6 +51,9 @@ class Point(models.Model):
         PointType, on_delete=models.PROTECT, related_name="points", null=True
     )
 
+    class Meta:
+        indexes = [models.Index(fields=["headline"])]
+
     def get_html(self):
         """Convert markdown in 'contents' field to HTML and sanitize."""
         html = md.render(self.contents)
@@ -1,3 +1,608 @@
-from django.test import TestCase
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
 
-# Create your tests here.
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from syllabooster.models import *
+from syllabooster.utils import importstr
+from syllabooster.utils.orgreader import iter_nodes
+
+FIXTURE = """#+TODO: PENDING | DELIVERED
+* Unit A :ua:
+:PROPERTIES:
+:POSITION: 1
+:END:
+** PENDING First point :p1:
+:PROPERTIES:
+:TYPE: theory
+:END:
+First contents
+** DELIVERED Second point
+:PROPERTIES:
+:TYPE: exercise
+:END:
+Second contents
+* Unit B
+:PROPERTIES:
+:POSITION: 2
+:END:
+** Third point :p1:p3:
+Third contents
+"""
+
+
+def org_file(units, points_per_unit, prefix):
+    return "".join(
+        f"* Unit {unit} :u{unit}:\n:PROPERTIES:\n:POSITION: {unit}\n:END:\n"
+        + "".join(
+            f"** PENDING {prefix} {unit}.{point} :t{point}:\nContents\n"
+            for point in range(points_per_unit)
+        )
+        for unit in range(1, units + 1)
+    )
+
+
+class OrgReaderTests(SimpleTestCase):
+    def test_todo_keywords(self):
+        nodes = list(
+            iter_nodes(
+                "#+TODO: PENDING(p) | DELIVERED(d)\n"
+                "#+SEQ_TODO: UNASSIGNED | REVIEWED\n"
+                "* PENDING One\n* REVIEWED Two\n* TODO Three\n* Four\n"
+            )
+        )
+        self.assertEqual(
+            [(node["todo"], node["heading"]) for node in nodes],
+            [
+                ("PENDING", "One"),
+                ("REVIEWED", "Two"),
+                ("", "TODO Three"),
+                ("", "Four"),
+            ],
+        )
+
+    def test_default_todo_keywords(self):
+        nodes = list(iter_nodes("* TODO One\n* DONE Two\n* PENDING Three\n"))
+        self.assertEqual(
+            [(node["todo"], node["heading"]) for node in nodes],
+            [("TODO", "One"), ("DONE", "Two"), ("", "PENDING Three")],
+        )
+
+    def test_tags_and_filetags(self):
+        nodes = list(
+            iter_nodes(
+                "#+FILETAGS: :ft1:ft2:\n"
+                "* Unit :u1:u2:\n** Point :p:\n#+FILETAGS: :late:\n** Plain\n"
+            )
+        )
+        self.assertEqual(
+            [(node["level"], node["heading"], node["tags"]) for node in nodes],
+            [
+                (1, "Unit", {"ft1", "ft2", "u1", "u2"}),
+                (2, "Point", {"ft1", "ft2", "p"}),
+                (2, "Plain", {"ft1", "ft2"}),
+            ],
+        )
+
+    def test_properties_drawer(self):
+        (node,) = iter_nodes(
+            "* Point\n:PROPERTIES:\n:TYPE:     exercise\n:POSITION: 3\n:END:\n"
+            "Body\n:PROPERTIES:\n:OTHER: x\n:END:\n"
+        )
+        self.assertEqual(node["properties"], {"TYPE": "exercise", "POSITION": "3"})
+        self.assertEqual(node["body"], "Body\n:PROPERTIES:\n:OTHER: x\n:END:")
+
+    def test_planning_clock_and_state_change_lines(self):
+        (node,) = iter_nodes(
+            "#+TODO: PENDING | DELIVERED\n"
+            "* DELIVERED Point\n"
+            "SCHEDULED: <2024-01-01 Mon>\n"
+            ":PROPERTIES:\n:TYPE: theory\n:END:\n"
+            "CLOCK: [2024-01-01 Mon 10:00]--[2024-01-01 Mon 10:30] =>  0:30\n"
+            '- State "DELIVERED"  from "PENDING"  [2024-01-02 Tue 10:00]\n'
+            "Body\n"
+            "SCHEDULED: <2024-01-03 Wed>\n"
+        )
+        self.assertEqual(node["properties"], {"TYPE": "theory"})
+        self.assertEqual(node["body"], "Body\nSCHEDULED: <2024-01-03 Wed>")
+
+    def test_links_and_priority(self):
+        (node,) = iter_nodes(
+            "* [#A] See [[https://example.com][the example]]\n"
+            "Read [[https://example.com]] and [[file:x.org][x]].\n"
+        )
+        self.assertEqual(node["heading"], "See the example")
+        self.assertEqual(node["todo"], "")
+        self.assertEqual(node["body"], "Read https://example.com and x.")
+
+    def test_body_excludes_subheadings(self):
+        nodes = list(iter_nodes("Preamble\n* Unit\n** Point\ntext\n*** Sub\nmore\n"))
+        self.assertEqual(
+            [(node["level"], node["heading"], node["body"]) for node in nodes],
+            [(1, "Unit", ""), (2, "Point", "text"), (3, "Sub", "more")],
+        )
+
+    def test_test_org(self):
+        # Nodes that orgparse.loads gave for test.org when the reader replaced it.
+        input_string = (settings.BASE_DIR / "test.org").read_text(encoding="utf-8")
+        nodes = list(iter_nodes(input_string))
+        self.assertEqual(
+            [
+                (
+                    node["level"],
+                    node["todo"],
+                    node["heading"],
+                    sorted(node["tags"]),
+                    node["properties"],
+                )
+                for node in nodes
+            ],
+            [
+                (1, "", "Tema 4: Números Complejos", ["complejos"], {"POSITION": "4"}),
+                (2, "PENDING", "Unidad imaginaria", [], {"TYPE": "theory"}),
+                (2, "PENDING", "Número imaginario", [], {"TYPE": "theory"}),
+                (2, "PENDING", "Número complejo", [], {"TYPE": "theory"}),
+                (
+                    2,
+                    "PENDING",
+                    "Parte real de un número complejo",
+                    [],
+                    {"TYPE": "theory"},
+                ),
+                (
+                    2,
+                    "PENDING",
+                    "Parte imaginaria de un número complejo",
+                    [],
+                    {"TYPE": "theory"},
+                ),
+                (2, "PENDING", "Módulo de un número complejo", [], {"TYPE": "theory"}),
+                (
+                    2,
+                    "PENDING",
+                    "Conjunto de los números complejos",
+                    [],
+                    {"TYPE": "theory"},
+                ),
+                (
+                    1,
+                    "",
+                    "Tema 5: Geometría Analítica",
+                    ["geometría"],
+                    {"POSITION": "5"},
+                ),
+                (
+                    2,
+                    "PENDING",
+                    "Definición algebraica de vector libre",
+                    ["vectores"],
+                    {"TYPE": "theory"},
+                ),
+                (
+                    2,
+                    "PENDING",
+                    "Definición de $\\mathbb{R}^{2}$",
+                    ["vectores"],
+                    {"TYPE": "theory"},
+                ),
+                (
+                    2,
+                    "PENDING",
+                    "Definición geométrica de vector libre",
+                    ["vectores"],
+                    {"TYPE": "theory"},
+                ),
+                (
+                    2,
+                    "PENDING",
+                    "Relación entre definiciones algebraica y geométrica de un vector libre",
+                    ["vectores"],
+                    {"TYPE": "theory"},
+                ),
+                (
+                    2,
+                    "PENDING",
+                    "Suma de vectores libres: definición algebraica",
+                    ["vectores"],
+                    {"TYPE": "theory"},
+                ),
+                (
+                    2,
+                    "PENDING",
+                    "Suma de vectores libres: interpretación geométrica",
+                    ["vectores"],
+                    {"TYPE": "theory"},
+                ),
+                (
+                    2,
+                    "PENDING",
+                    "Producto de un escalar por un vector libre: definición algebraica",
+                    ["vectores"],
+                    {"TYPE": "theory"},
+                ),
+                (
+                    2,
+                    "PENDING",
+                    "Producto de un escalar por un vector libre: interpretación geométrica",
+                    ["vectores"],
+                    {"TYPE": "theory"},
+                ),
+                (
+                    2,
+                    "UNASSIGNED",
+                    "Ejercicio 131.3",
+                    ["vectores"],
+                    {"TYPE": "exercise"},
+                ),
+                (2, "PENDING", "Vector unitario", ["vectores"], {"TYPE": "theory"}),
+                (
+                    2,
+                    "PENDING",
+                    "Normalizar un vector",
+                    ["vectores"],
+                    {"TYPE": "theory"},
+                ),
+                (
+                    2,
+                    "UNASSIGNED",
+                    "Ejercicio 131.8",
+                    ["vectores"],
+                    {"TYPE": "exercise"},
+                ),
+                (2, "PENDING", "Combinación lineal", ["vectores"], {"TYPE": "theory"}),
+                (2, "PENDING", "Dependencia lineal", ["vectores"], {"TYPE": "theory"}),
+                (
+                    2,
+                    "UNASSIGNED",
+                    "Ejercicio 131.4",
+                    ["vectores"],
+                    {"TYPE": "exercise"},
+                ),
+                (2, "PENDING", "Definición de base", ["vectores"], {"TYPE": "theory"}),
+                (
+                    2,
+                    "PENDING",
+                    "Coordenadas de un vector respecto de una base",
+                    ["vectores"],
+                    {"TYPE": "theory"},
+                ),
+                (2, "PENDING", "Base canónica", ["vectores"], {"TYPE": "theory"}),
+                (
+                    2,
+                    "UNASSIGNED",
+                    "Ejercicio 131.6",
+                    ["vectores"],
+                    {"TYPE": "exercise"},
+                ),
+                (
+                    2,
+                    "UNASSIGNED",
+                    "Ejercicio 131.7",
+                    ["vectores"],
+                    {"TYPE": "exercise"},
+                ),
+                (
+                    2,
+                    "UNASSIGNED",
+                    "Ejercicio 131.10",
+                    ["vectores"],
+                    {"TYPE": "exercise"},
+                ),
+                (
+                    2,
+                    "UNASSIGNED",
+                    "Ejercicio 131.11",
+                    ["vectores"],
+                    {"TYPE": "exercise"},
+                ),
+                (
+                    2,
+                    "PENDING",
+                    "Definición algebraica de producto escalar",
+                    ["vectores"],
+                    {"TYPE": "theory"},
+                ),
+                (
+                    2,
+                    "PENDING",
+                    "Definición geométrica de producto escalar",
+                    ["vectores"],
+                    {"TYPE": "theory"},
+                ),
+                (
+                    2,
+                    "PENDING",
+                    "Propiedades del producto escalar",
+                    ["vectores"],
+                    {"TYPE": "theory"},
+                ),
+                (
+                    2,
+                    "PENDING",
+                    "Ángulo entre dos vectores",
+                    ["vectores"],
+                    {"TYPE": "theory"},
+                ),
+                (2, "PENDING", "Ecuaciones de la recta", ["recta"], {"TYPE": "theory"}),
+                (1, "", "Tema 6: Funciones", ["análisis"], {"POSITION": "6"}),
+                (2, "PENDING", "Concepto de función", [], {"TYPE": "theory"}),
+                (
+                    2,
+                    "PENDING",
+                    "Definición de dominio de una función",
+                    [],
+                    {"TYPE": "theory"},
+                ),
+                (
+                    2,
+                    "PENDING",
+                    "Definición de recorrido de una función",
+                    [],
+                    {"TYPE": "theory"},
+                ),
+                (
+                    2,
+                    "PENDING",
+                    "Cálculo analítico del dominio de funciones elementales",
+                    [],
+                    {"TYPE": "theory"},
+                ),
+                (
+                    2,
+                    "PENDING",
+                    "Cálculo gráfico del recorrido de funciones",
+                    [],
+                    {"TYPE": "theory"},
+                ),
+                (2, "PENDING", "Puntos de corte con los ejes", [], {"TYPE": "theory"}),
+                (2, "PENDING", "Paridad de una función", [], {"TYPE": "theory"}),
+                (
+                    2,
+                    "PENDING",
+                    "Definición de función periódica",
+                    [],
+                    {"TYPE": "theory"},
+                ),
+            ],
+        )
+        self.assertEqual(
+            {node["heading"]: node["body"] for node in nodes if node["body"]},
+            {
+                "Propiedades del producto escalar": "- Conmutativa\n- Homogénea\n- Positividad\n- Distributiva\n- Ortogonalidad\n- Paralelismo"
+            },
+        )
+
+
+class ImportOrgTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="manuel")
+        for name in ["theory", "exercise"]:
+            point_type = PointType.objects.create(name=name)
+            for position, state in enumerate(["pending", "delivered"]):
+                DeliveryState.objects.create(
+                    point_type=point_type, name=state, position=position
+                )
+        Tag.objects.create(name="p1")
+
+    def setUp(self):
+        self.course = Course.objects.create(name="C1", user=self.user)
+
+    def import_org(self, input_string, unitnumbers=[], insert=False):
+        return importstr.parse_org(
+            self.course,
+            input_string,
+            self.user,
+            unitnumbers,
+            insert,
+            True,
+            StringIO(),
+        )
+
+    def unit_titles(self):
+        return list(
+            Unit.objects.filter(course=self.course)
+            .order_by("position")
+            .values_list("position", "title")
+        )
+
+    def course_points(self):
+        return [
+            (
+                coursepoint.position,
+                coursepoint.point.headline,
+                coursepoint.unit.title,
+                coursepoint.state.name if coursepoint.state else None,
+                coursepoint.point.point_type.name,
+                sorted(coursepoint.point.tags.values_list("name", flat=True)),
+            )
+            for coursepoint in CoursePoint.objects.filter(course=self.course)
+            .select_related("point__point_type", "unit", "state")
+            .order_by("position")
+        ]
+
+    def test_report_queries(self):
+        output = StringIO()
+        with importstr.report_queries(output):
+            list(Unit.objects.all())
+            list(Point.objects.all())
+        self.assertRegex(output.getvalue(), r"^2 queries in ")
+        output = StringIO()
+        with importstr.report_queries(output, enabled=False):
+            list(Unit.objects.all())
+        self.assertEqual(output.getvalue(), "")
+
+    def test_read_org(self):
+        with self.assertNumQueries(0):
+            units, points = importstr.read_org(FIXTURE)
+        self.assertEqual(
+            [(unit.position, unit.title, unit.tags) for unit in units],
+            [(1, "Unit A", {"ua"}), (2, "Unit B", set())],
+        )
+        self.assertEqual(
+            [
+                (point.headline, point.type_name, point.todo, point.tags)
+                for point in points
+            ],
+            [
+                ("First point", "theory", "pending", {"p1"}),
+                ("Second point", "exercise", "delivered", set()),
+                ("Third point", "Theory", "", {"p1", "p3"}),
+            ],
+        )
+        self.assertEqual(
+            [point.unit for point in points], [units[0], units[0], units[1]]
+        )
+
+    def test_write_org(self):
+        units, points = importstr.read_org(FIXTURE, number_units=True)
+        with self.assertNumQueries(10):
+            importstr.write_org(self.course, units, points)
+        self.assertEqual(self.unit_titles(), [(1, "Unit A"), (2, "Unit B")])
+        self.assertEqual(
+            self.course_points(),
+            [
+                (1, "First point", "Unit A", "pending", "theory", ["p1", "ua"]),
+                (2, "Second point", "Unit A", "delivered", "exercise", ["ua"]),
+                (3, "Third point", "Unit B", None, "theory", ["p1", "p3"]),
+            ],
+        )
+        self.assertEqual(
+            Point.objects.get(headline="Third point").contents, "Third contents"
+        )
+        self.assertEqual(Tag.objects.filter(name="p1").count(), 1)
+
+    def test_write_org_queries_do_not_depend_on_file_size(self):
+        query_counts = []
+        for units, points_per_unit in [(2, 2), (20, 10)]:
+            course = Course.objects.create(name=f"C{units}", user=self.user)
+            units, points = importstr.read_org(
+                org_file(units, points_per_unit, course.name), number_units=True
+            )
+            with CaptureQueriesContext(connection) as queries:
+                importstr.write_org(course, units, points)
+            query_counts.append(len(queries))
+        self.assertEqual(query_counts[0], query_counts[1])
+        self.assertEqual(CoursePoint.objects.filter(course=course).count(), 200)
+
+    def test_replace_unit(self):
+        self.import_org(FIXTURE)
+        with self.assertNumQueries(18):
+            self.import_org(
+                "#+TODO: PENDING | DELIVERED\n"
+                "* Unit C\n:PROPERTIES:\n:POSITION: 1\n:END:\n"
+                "** Fourth point\n"
+                "** PENDING Second point\n"
+                ":PROPERTIES:\n:TYPE: exercise\n:END:\n"
+                "New contents\n"
+            )
+        self.assertEqual(self.unit_titles(), [(1, "Unit C"), (2, "Unit B")])
+        # Tags belong to the point, so Second point keeps the tag of Unit A.
+        self.assertEqual(
+            self.course_points(),
+            [
+                (1, "Fourth point", "Unit C", None, "theory", []),
+                (2, "Second point", "Unit C", "pending", "exercise", ["ua"]),
+                (3, "Third point", "Unit B", None, "theory", ["p1", "p3"]),
+            ],
+        )
+        self.assertEqual(
+            Point.objects.get(headline="Second point").contents, "New contents"
+        )
+
+    def test_insert_unit(self):
+        self.import_org(FIXTURE)
+        with self.assertNumQueries(16):
+            self.import_org(
+                "* Unit C\n:PROPERTIES:\n:POSITION: 2\n:END:\n** Fourth point\n",
+                insert=True,
+            )
+        self.assertEqual(
+            self.unit_titles(), [(1, "Unit A"), (2, "Unit C"), (3, "Unit B")]
+        )
+        self.assertEqual(
+            [coursepoint[:3] for coursepoint in self.course_points()],
+            [
+                (1, "First point", "Unit A"),
+                (2, "Second point", "Unit A"),
+                (3, "Fourth point", "Unit C"),
+                (4, "Third point", "Unit B"),
+            ],
+        )
+
+    def test_import_unit_reports_unknown_point_type(self):
+        result = importstr.import_unit(
+            "C1",
+            "* Unit A\n:PROPERTIES:\n:POSITION: 1\n:END:\n"
+            "** First point\n:PROPERTIES:\n:TYPE: bogus\n:END:\n",
+            "manuel",
+            "org",
+            output=StringIO(),
+        )
+        self.assertEqual(
+            result,
+            {"status": "error", "message": 'Point type "bogus" does not exist'},
+        )
+        self.assertFalse(Unit.objects.filter(course=self.course).exists())
+
+    def test_insert_units_out_of_order(self):
+        self.import_org(
+            "* A1\n:PROPERTIES:\n:POSITION: 1\n:END:\n** a1\n"
+            "* A2\n:PROPERTIES:\n:POSITION: 2\n:END:\n** a2\n"
+        )
+        self.import_org(
+            "* B2\n:PROPERTIES:\n:POSITION: 2\n:END:\n** b2\n"
+            "* B1\n:PROPERTIES:\n:POSITION: 1\n:END:\n** b1\n",
+            insert=True,
+        )
+        self.assertEqual(
+            self.unit_titles(), [(1, "B1"), (2, "A1"), (3, "B2"), (4, "A2")]
+        )
+        self.assertEqual(
+            list(
+                CoursePoint.objects.filter(course=self.course)
+                .order_by("position")
+                .values_list("position", "point__headline", "unit__title")
+            ),
+            [(1, "b1", "B1"), (2, "a1", "A1"), (3, "b2", "B2"), (4, "a2", "A2")],
+        )
+
+
+class ImportCourseCommandTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="manuel")
+        PointType.objects.create(name="theory")
+
+    def import_course(self, input_string):
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "course.org"
+            path.write_text(input_string, encoding="utf-8")
+            call_command("importcourse", "C1", str(path), "-f", stdout=StringIO())
+
+    def test_failed_import_keeps_the_old_course(self):
+        self.import_course("* Unit A\n** First point\n** Second point\n")
+        with self.assertRaisesMessage(
+            CommandError, 'Point type "bogus" does not exist'
+        ):
+            self.import_course(
+                "* Unit B\n** Third point\n:PROPERTIES:\n:TYPE: bogus\n:END:\n"
+            )
+        course = Course.objects.get(name="C1", user=self.user)
+        self.assertEqual(
+            list(course.unit_set.values_list("title", flat=True)), ["Unit A"]
+        )
+        self.assertEqual(
+            list(
+                CoursePoint.objects.filter(course=course)
+                .order_by("position")
+                .values_list("point__headline", flat=True)
+            ),
+            ["First point", "Second point"],
+        )
@@ -1,12 +1,17 @@
 #!/usr/bin/env python
 import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
 from io import StringIO
 
 from django.http import JsonResponse
-import orgparse
 
-from django.db.models import F
+from django.db import connection, transaction
+from django.db.models import Case, F, Value, When
+from django.test.utils import CaptureQueriesContext
 from syllabooster.models import *
+from syllabooster.utils.orgreader import iter_nodes
 
 
 class SyllaboostStyler:
@@ -17,15 +22,39 @@ class SyllaboostStyler:
         return message
 
 
+# Importing is bound by database round-trips, not by CPU, so files are imported in two
+# passes: read_org reads them into plain unit and point specs without touching the
+# database, and write_org writes these with bulk queries, whose number doesn't depend on
+# the size of the file. The importers' -p,--profile option uses report_queries to print
+# the queries they actually issue.
+@contextmanager
+def report_queries(output, enabled=True):
+    """Writes the number of SQL queries run inside the block, the time spent in them
+    and the total time of the block to output. Does nothing if enabled is False."""
+    if not enabled:
+        yield
+        return
+    start = time.perf_counter()
+    with CaptureQueriesContext(connection) as queries:
+        yield
+    elapsed = time.perf_counter() - start
+    query_time = sum(float(query["time"]) for query in queries.captured_queries)
+    output.write(
+        f"{len(queries)} queries in {query_time:.3f}s "
+        f"(total import time {elapsed:.3f}s)"
+    )
+
+
+@transaction.atomic
 def renumber_points(course):
-    units = Unit.objects.filter(course=course).order_by("position")
-    point_number = 1
-    for unit in units:
-        points = CoursePoint.objects.filter(unit=unit).order_by("position")
-        for point in points:
-            point.position = point_number
-            point.save()
-            point_number = point_number + 1
+    points = list(
+        CoursePoint.objects.filter(unit__course=course).order_by(
+            "unit__position", "position"
+        )
+    )
+    for point_number, point in enumerate(points, 1):
+        point.position = point_number
+    CoursePoint.objects.bulk_update(points, ["position"], batch_size=1000)
 
 
 def should_be_imported(unit, unitnumbers):
@@ -34,6 +63,153 @@ def should_be_imported(unit, unitnumbers):
     return True
 
 
+# Units are compared by identity: points refer to the spec of their unit, whose
+# position may still change while conflicts with existing units are resolved.
+@dataclass(eq=False)
+class UnitSpec:
+    position: int
+    title: str
+    tags: set
+
+
+@dataclass
+class PointSpec:
+    headline: str
+    contents: str
+    type_name: str
+    tags: set
+    todo: str
+    unit: UnitSpec | None
+
+
+def read_org(input_string, number_units=False):
+    """Reads the units and points of an org file without touching the database.
+
+    Units take their position from their POSITION property, or from their order in
+    the file if number_units is True. Points before the first unit have no unit."""
+    units = []
+    points = []
+    unit = None
+    for node in iter_nodes(input_string):
+        if node["level"] == 1:
+            if number_units:
+                position = len(units) + 1
+            else:
+                position = int(node["properties"].get("POSITION"))
+            unit = UnitSpec(position, node["heading"], node["tags"])
+            units.append(unit)
+        elif node["level"] == 2:
+            points.append(
+                PointSpec(
+                    headline=node["heading"],
+                    contents=node["body"],
+                    type_name=node["properties"].get("TYPE") or "Theory",
+                    tags=node["tags"],
+                    todo=node["todo"].lower(),
+                    unit=unit,
+                )
+            )
+    return units, points
+
+
+def write_org(course, units, points):
+    """Adds units and points read by read_org to course.
+
+    Points are positioned in the given order and get the tags of their unit. The
+    number of queries doesn't depend on the number of units, points or tags."""
+    point_types = {
+        point_type.name.lower(): point_type for point_type in PointType.objects.all()
+    }
+    states = {
+        (state.point_type_id, state.name): state
+        for state in DeliveryState.objects.all()
+    }
+    fields = {}
+    for point in points:
+        try:
+            point_type = point_types[point.type_name.lower()]
+        except KeyError:
+            raise PointType.DoesNotExist(
+                f'Point type "{point.type_name}" does not exist'
+            ) from None
+        fields[point.headline] = (point.contents, point_type)
+
+    db_units = dict(
+        zip(
+            units,
+            Unit.objects.bulk_create(
+                [
+                    Unit(course=course, position=unit.position, title=unit.title)
+                    for unit in units
+                ]
+            ),
+        )
+    )
+
+    existing_points = set(
+        Point.objects.filter(headline__in=fields).values_list("headline", flat=True)
+    )
+    Point.objects.bulk_create(
+        [
+            Point(headline=headline, contents=contents, point_type=point_type)
+            for headline, (contents, point_type) in fields.items()
+            if headline not in existing_points
+        ]
+    )
+    db_points = {
+        point.headline: point for point in Point.objects.filter(headline__in=fields)
+    }
+    for headline in existing_points:
+        db_point = db_points[headline]
+        db_point.contents, db_point.point_type = fields[headline]
+    Point.objects.bulk_update(
+        [db_points[headline] for headline in existing_points],
+        ["contents", "point_type"],
+        batch_size=1000,
+    )
+
+    tag_names = set().union(
+        *(unit.tags for unit in units), *(point.tags for point in points)
+    )
+    Tag.objects.bulk_create(
+        [Tag(name=name) for name in tag_names], ignore_conflicts=True
+    )
+    tag_ids = dict(Tag.objects.filter(name__in=tag_names).values_list("name", "id"))
+
+    tag_links = set()
+    coursepoints = []
+    for position, point in enumerate(points, 1):
+        db_point = db_points[point.headline]
+        tags = point.tags
+        unit = None
+        if point.unit is not None:
+            tags = tags | point.unit.tags
+            unit = db_units[point.unit]
+        for tag in tags:
+            tag_links.add((db_point.id, tag_ids[tag]))
+        state = None
+        if point.todo:
+            state = states.get((db_point.point_type_id, point.todo))
+        coursepoints.append(
+            CoursePoint(
+                course=course,
+                point=db_point,
+                position=position,
+                state=state,
+                unit=unit,
+            )
+        )
+    Point.tags.through.objects.bulk_create(
+        [
+            Point.tags.through(point_id=point_id, tag_id=tag_id)
+            for point_id, tag_id in tag_links
+        ],
+        ignore_conflicts=True,
+        batch_size=2000,
+    )
+    CoursePoint.objects.bulk_create(coursepoints, batch_size=1000)
+
+
 def parse_org(
     course,
     input_string,
@@ -44,90 +220,91 @@ def parse_org(
     output=sys.stdout,
     styler=SyllaboostStyler(),
 ):
-    root = orgparse.loads(input_string)
-    current_unit = 0
-    next_point = 1
-    unit_tags = {}
-    unit = None
+    units, points = read_org(input_string)
+    existing_positions = set(
+        Unit.objects.filter(course=course).values_list("position", flat=True)
+    )
+    new_units = []
+    # Deletes and shifts of existing units are applied together with the import,
+    # once every unit has been resolved, so that no transaction is held open while
+    # the user is asked for confirmation. shifted maps the position of each
+    # existing unit to the one it ends up in.
+    deleted = []
+    shifted = {position: position for position in existing_positions}
     output.write(f"Unit numbers to be imported: {unitnumbers or 'all'}")
-    for node in root[1:]:
-        if node.level == 1:
-            current_unit = int(node.get_property("POSITION"))
-            node.unit = current_unit
-            output.write(f'Found unit "{node.heading}" with position {current_unit}')
-            if should_be_imported(current_unit, unitnumbers):
-                output.write(f"Position {current_unit} should be imported.")
-                if Unit.objects.filter(course=course, position=current_unit).exists():
-                    if not insert:
-                        if not force:
-                            output.write(
-                                styler.WARNING(
-                                    f"There is already a unit with number {current_unit} in course {course.name} for user {user.username}: it will be replaced."
-                                )
-                            )
-                            confirm = input("Are you sure you want to proceed? [y/N]: ")
-                            if confirm.lower() not in ["y", "yes"]:
-                                output.write(styler.ERROR("Unit skipped."))
-                                continue
-                        Unit.objects.filter(
-                            course=course, position=current_unit
-                        ).delete()
-                    else:
-                        Unit.objects.filter(
-                            course=course, position__gte=current_unit
-                        ).update(position=F("position") + 10000)
-                        Unit.objects.filter(
-                            course, position__gte=current_unit + 10000
-                        ).update(position=F("position") - 9999)
-
-                unit = Unit.objects.create(
-                    course=course,
-                    position=current_unit,
-                    title=node.heading,
+    for unit in units:
+        current_unit = unit.position
+        output.write(f'Found unit "{unit.title}" with position {current_unit}')
+        if not should_be_imported(current_unit, unitnumbers):
+            continue
+        output.write(f"Position {current_unit} should be imported.")
+        if current_unit in existing_positions:
+            if not insert:
+                if not force:
+                    output.write(
+                        styler.WARNING(
+                            f"There is already a unit with number {current_unit} in course {course.name} for user {user.username}: it will be replaced."
+                        )
+                    )
+                    confirm = input("Are you sure you want to proceed? [y/N]: ")
+                    if confirm.lower() not in ["y", "yes"]:
+                        output.write(styler.ERROR("Unit skipped."))
+                        continue
+                deleted.append(current_unit)
+                new_units = [
+                    pending for pending in new_units if pending.position != current_unit
+                ]
+            else:
+                # Units read earlier in the file are not in the database yet, so
+                # they are shifted here along with the existing ones.
+                shifted = {
+                    old: new + 1 if new >= current_unit else new
+                    for old, new in shifted.items()
+                }
+                existing_positions = {
+                    position + 1 if position >= current_unit else position
+                    for position in existing_positions
+                }
+                for pending in new_units:
+                    if pending.position >= current_unit:
+                        pending.position += 1
+        existing_positions.add(current_unit)
+        new_units.append(unit)
+
+    # Points of units that are not imported (or that the user chose to keep) are
+    # skipped too.
+    imported_units = set(new_units)
+    new_points = [
+        point
+        for point in points
+        if point.unit in imported_units
+        or (point.unit is None and should_be_imported(0, unitnumbers))
+    ]
+    for point in new_points:
+        output.write(f'Importing point "{point.headline}" of type {point.type_name}')
+    moved = {old: new for old, new in shifted.items() if old != new}
+    with transaction.atomic():
+        if deleted:
+            Unit.objects.filter(course=course, position__in=deleted).delete()
+        if moved:
+            # Shifting in a single UPDATE would collide with the unique (course,
+            # position) constraint halfway through, so the units are moved out of
+            # the way first and then back to their new positions.
+            Unit.objects.filter(course=course, position__in=moved).update(
+                position=F("position") + 10000
+            )
+            Unit.objects.filter(
+                course=course, position__in=[old + 10000 for old in moved]
+            ).update(
+                position=Case(
+                    *(
+                        When(position=old + 10000, then=Value(new))
+                        for old, new in moved.items()
+                    )
                 )
-                unit_tags[current_unit] = []
-                for tag in node.tags:
-                    unit_tags[current_unit].append(tag)
-        elif should_be_imported(current_unit, unitnumbers) and node.level == 2:
-            point_type = node.get_property("TYPE") or "Theory"
-            output.write(f'Importing point "{node.heading}" of type {point_type}')
-            point, created = Point.objects.get_or_create(headline=node.heading)
-            point.contents = node.body
-            point.save()
-            for tag in node.tags:
-                db_tag, created = Tag.objects.get_or_create(name=tag)
-                point.tags.add(db_tag)
-            point.point_type = PointType.objects.get(name=point_type.lower())
-            point.save()
-
-            state = None
-            todo = node.todo.lower()
-            if todo:
-                try:
-                    state = DeliveryState.objects.filter(
-                        point_type_id=point.point_type.id
-                    ).get(name=todo)
-                except DeliveryState.DoesNotExist:
-                    state = None
-                    unit = None
-            if not (node.parent is root):
-                unit_position = node.parent.unit
-                unit = Unit.objects.get(course=course, position=unit_position)
-                for tag in unit_tags[unit_position]:
-                    db_tag, created = Tag.objects.get_or_create(name=tag)
-                    point.tags.add(db_tag)
-                    point.save()
-
-            coursepoint = CoursePoint(
-                course=course,
-                point=point,
-                position=next_point,
-                state=state,
-                unit=unit,
             )
-            coursepoint.save()
-            next_point = next_point + 1
-            renumber_points(course)
+        write_org(course, new_units, new_points)
+        renumber_points(course)
 
     return {"status": "ok", "units": f"{unitnumbers}"}
 
@@ -158,6 +335,9 @@ def import_unit(
     if input_format == "md":
         return parse_md(input_string, unitnumbers, insert, force)
     elif input_format == "org":
-        return parse_org(
-            course, input_string, user, unitnumbers, insert, force, output, styler
-        )
+        try:
+            return parse_org(
+                course, input_string, user, unitnumbers, insert, force, output, styler
+            )
+        except PointType.DoesNotExist as error:
+            return {"status": "error", "message": str(error)}
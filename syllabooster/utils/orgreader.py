@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+#
+# A reader for the subset of org syntax used by syllabus files.
+#
+# The importers only need, for each heading, its level, TODO keyword, text, tags, the
+# values in its PROPERTIES drawer and its body. orgparse builds a whole document tree
+# (timestamps, clocks, logbooks, inherited tags...) to get there; this module reads the
+# same information with a single pass over the lines of the file.
+#
+# It follows orgparse's behaviour for that subset:
+# - TODO keywords are taken from #+TODO, #+SEQ_TODO and #+TYP_TODO lines anywhere in the
+#   file (TODO and DONE if there are none);
+# - #+FILETAGS given before the first heading are added to the tags of every heading;
+# - the first PROPERTIES drawer of a heading is not part of its body, and neither are a
+#   SCHEDULED/DEADLINE/CLOSED line right below the heading nor CLOCK lines;
+# - state change log lines (- State "DONE" from "TODO" [date]) are not part of the body;
+# - links are replaced by their description in headings and bodies;
+# - the body of a heading does not include its subheadings.
+
+import re
+
+HEADING = re.compile(r"^(\*+) \s*(.*?)\s*$")
+HEADING_TAGS = re.compile(r"(.*?)\s*:([\w@:]+):\s*$")
+HEADING_PRIORITY = re.compile(r"^\s*\[#([A-Z0-9])\] ?(.*)$")
+TODO_SETTING = re.compile(
+    r"^\s*#\+(?:SEQ_|TYP_)?TODO:(.*)$", re.IGNORECASE | re.MULTILINE
+)
+FILETAGS_SETTING = re.compile(r"^\s*#\+FILETAGS:(.*)$", re.IGNORECASE)
+PROPERTY = re.compile(r"^\s*:(.*?):\s*(.*?)\s*$")
+PLANNING = re.compile(r"^\s*(?:SCHEDULED|DEADLINE|CLOSED):")
+CLOCK = re.compile(r"^\s*CLOCK:")
+STATE_CHANGE = re.compile(r'\s*-\s+State\s+"[^"]+"\s+from\s+"[^"]+"\s+\[[^\]]+\]')
+LINK = re.compile(r"\[\[(?:[^\]]+\]\[)?([^\]]+)\]\]")
+
+
+def to_plain_text(text):
+    return LINK.sub(r"\1", text)
+
+
+def todo_keywords(input_string):
+    keywords = set()
+    for setting in TODO_SETTING.findall(input_string):
+        for keyword in setting.replace("|", " ").split():
+            keywords.add(keyword.split("(", 1)[0])
+    keywords.discard("")
+    return keywords or {"TODO", "DONE"}
+
+
+def parse_heading(match, keywords, filetags):
+    """Returns a node for a heading line matched by HEADING."""
+    heading = match.group(2)
+    tags = set(filetags)
+    tags_match = HEADING_TAGS.search(heading)
+    if tags_match:
+        heading = tags_match.group(1)
+        tags.update(tag for tag in tags_match.group(2).split(":") if tag)
+    todo = ""
+    first_word, _, rest = heading.partition(" ")
+    if first_word in keywords:
+        todo, heading = first_word, rest
+    priority_match = HEADING_PRIORITY.search(heading)
+    if priority_match:
+        heading = priority_match.group(2)
+    return {
+        "level": len(match.group(1)),
+        "heading": to_plain_text(heading),
+        "todo": todo,
+        "tags": tags,
+        "properties": {},
+        "body": [],
+    }
+
+
+def iter_nodes(input_string):
+    """Yields a dict per heading, in file order, with the keys level, heading, todo
+    (an empty string if there is none), tags, properties and body."""
+    keywords = todo_keywords(input_string)
+    filetags = set()
+    node = None
+    for line in input_string.splitlines():
+        match = HEADING.match(line)
+        if match:
+            if node is not None:
+                node["body"] = to_plain_text("\n".join(node["body"]))
+                yield node
+            node = parse_heading(match, keywords, filetags)
+            first_line = True
+            drawer = "missing"
+            continue
+        if node is None:
+            filetags_match = FILETAGS_SETTING.match(line)
+            if filetags_match:
+                filetags.update(
+                    tag.strip()
+                    for tag in filetags_match.group(1).split(":")
+                    if tag.strip()
+                )
+            continue
+        if first_line:
+            first_line = False
+            if PLANNING.match(line):
+                continue
+        if drawer == "open":
+            if ":END:" in line:
+                drawer = "closed"
+            else:
+                property_match = PROPERTY.search(line)
+                if property_match:
+                    key, value = property_match.groups()
+                    node["properties"][key] = value
+        elif drawer == "missing" and ":PROPERTIES:" in line:
+            drawer = "open"
+        elif not (CLOCK.match(line) or STATE_CHANGE.search(line)):
+            node["body"].append(line)
+    if node is not None:
+        node["body"] = to_plain_text("\n".join(node["body"]))
+        yield node